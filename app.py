@@ -1,17 +1,23 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import base64
+import hashlib
+import io
 import json
-from risk_calculator import RiskCalculator
-from care_plan_generator import CarePlanGenerator
-from population_analytics import PopulationAnalytics
-from watson_integration import WatsonHealthcareAI
+from typing import Dict, Any
 from utils import generate_sample_csv, calculate_bmi, validate_health_metrics
 
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Page configuration
 st.set_page_config(
     page_title="Healthcare AI Assistant",
@@ -30,12 +36,143 @@ if 'care_plan' not in st.session_state:
 if 'watson_insights' not in st.session_state:
     st.session_state.watson_insights = {}
 
-# Initialize Watson AI
-@st.cache_resource
+# Initialize Watson AI; heavy modules are imported where first needed
+# so Streamlit's top-to-bottom reruns stay light
 def init_watson():
-    return WatsonHealthcareAI()
+    from watson_integration import get_watson_ai
+    watson_ai = get_watson_ai()
+    # Called once per session, so each session sees the setup notice once
+    if watson_ai.init_error:
+        st.error(f"Failed to initialize Watson AI: {watson_ai.init_error}")
+    elif not watson_ai.watson_available:
+        st.warning("Watson AI credentials not fully configured. Some features may be limited.")
+    return watson_ai
+
+# Cached computations keyed on hashable inputs so reruns skip recomputation
+@st.cache_data(show_spinner=False)
+def _cached_risks(patient_items: tuple):
+    from risk_calculator import RiskCalculator
+    return RiskCalculator().calculate_all_risks(dict(patient_items))
+
+@st.cache_data(show_spinner=False)
+def _cached_care_plan(patient_items: tuple):
+    from care_plan_generator import CarePlanGenerator
+    return CarePlanGenerator().generate_care_plan(dict(patient_items), _cached_risks(patient_items))
+
+@st.cache_data(show_spinner=False)
+def _cached_pop_processed(file_digest: bytes, _file_bytes: bytes):
+    from population_analytics import PopulationAnalytics, CSV_COLUMN_DTYPES
+    df = pd.read_csv(
+        io.BytesIO(_file_bytes),
+        engine='pyarrow',
+        dtype_backend='pyarrow',
+        dtype=CSV_COLUMN_DTYPES
+    )
+    return PopulationAnalytics().process_population_data(df)
+
+@st.cache_data(show_spinner=False)
+def _cached_pop_insights(file_digest: bytes, _processed_data: pd.DataFrame):
+    from population_analytics import PopulationAnalytics
+    return PopulationAnalytics().generate_population_insights(_processed_data)
+
+@st.cache_data(show_spinner=False)
+def _cached_enriched_csv(file_digest: bytes, _processed_data: pd.DataFrame) -> bytes:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    # Arrow-backed columns convert without copying and are written by
+    # Arrow's multithreaded CSV writer
+    buffer = io.BytesIO()
+    table = pa.Table.from_pandas(_processed_data, preserve_index=False)
+    pacsv.write_csv(table, buffer, pacsv.WriteOptions(quoting_style='needed'))
+    return buffer.getvalue()
+
+def to_json_bytes(data: Dict[str, Any]) -> bytes:
+    """
+    Serialize a report to indented JSON bytes, using orjson when available
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(data, indent=2).encode()
+
+# Cached Plotly figure builders using graph_objects directly
+@st.cache_data(show_spinner=False)
+def build_risk_bar(risk_percentages: tuple) -> 'go.Figure':
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(
+        x=['Diabetes', 'Heart Disease', 'Hypertension'],
+        y=list(risk_percentages),
+        marker_color=[
+            '#2ecc71' if pct < 40 else '#f1c40f' if pct < 70 else '#e74c3c'
+            for pct in risk_percentages
+        ]
+    ))
+    fig.update_layout(
+        title="Risk Assessment Summary",
+        xaxis_title='Condition',
+        yaxis_title='Risk Percentage',
+        showlegend=False
+    )
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_risk_factors_bar(risk_factors_df: pd.DataFrame) -> 'go.Figure':
+    import plotly.graph_objects as go
+    fig = go.Figure([
+        go.Bar(x=group['relevance'], y=group['factor'], name=sentiment, orientation='h')
+        for sentiment, group in risk_factors_df.groupby('sentiment', sort=False)
+    ])
+    fig.update_layout(
+        title="Top Risk Factors by Relevance",
+        xaxis_title='relevance',
+        yaxis_title='factor',
+        legend_title_text='sentiment',
+        barmode='relative'
+    )
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_risk_level_pie(risk_counts: pd.Series) -> 'go.Figure':
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Pie(labels=risk_counts.index.tolist(), values=risk_counts.to_numpy()))
+    fig.update_layout(title="Overall Risk Level Distribution")
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_age_risk_bar(age_risk: pd.DataFrame) -> 'go.Figure':
+    import plotly.graph_objects as go
+    fig = go.Figure([
+        go.Bar(x=age_risk['age_group'].astype(str), y=age_risk[column], name=column)
+        for column in ['diabetes_risk', 'heart_disease_risk', 'hypertension_risk']
+    ])
+    fig.update_layout(
+        title="Average Risk by Age Group",
+        xaxis_title='age_group',
+        yaxis_title='value',
+        legend_title_text='variable',
+        barmode='group'
+    )
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_correlation_heatmap(correlation_matrix: np.ndarray, labels: tuple) -> 'go.Figure':
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Heatmap(
+        z=correlation_matrix,
+        x=list(labels),
+        y=list(labels),
+        colorscale='RdBu'
+    ))
+    fig.update_layout(title="Health Metrics Correlation Matrix", yaxis_autorange='reversed')
+    return fig
 
 def main():
+    # Resolve the shared Watson client once per session
+    if 'watson' not in st.session_state:
+        st.session_state.watson = init_watson()
+    
     st.title("🏥 Healthcare AI Assistant")
     st.markdown("**Comprehensive AI-powered risk assessment and care planning platform**")
     
@@ -46,8 +183,9 @@ def main():
     professionals for medical decisions and treatment plans.
     """)
     
-    # Sidebar for patient intake
-    with st.sidebar:
+    # Sidebar for patient intake; the form batches widget edits so the
+    # script only reruns when the assessment is submitted
+    with st.sidebar, st.form('intake'):
         st.header("📋 Patient Intake Form")
         
         # Basic Information
@@ -95,7 +233,7 @@ def main():
         allergies = st.text_area("Allergies", placeholder="List known allergies...")
         
         # Calculate button
-        if st.button("🔍 Calculate Risk Assessment", type="primary"):
+        if st.form_submit_button("🔍 Calculate Risk Assessment", type="primary"):
             # Compile patient data
             patient_data = {
                 'age': age,
@@ -127,18 +265,13 @@ def main():
             else:
                 st.session_state.patient_data = patient_data
                 
-                # Calculate risks
-                calculator = RiskCalculator()
-                st.session_state.risk_results = calculator.calculate_all_risks(patient_data)
-                
-                # Generate care plan
-                care_generator = CarePlanGenerator()
-                st.session_state.care_plan = care_generator.generate_care_plan(
-                    patient_data, st.session_state.risk_results
-                )
+                # Calculate risks and generate care plan (cached per patient input)
+                patient_items = tuple(patient_data.items())
+                st.session_state.risk_results = _cached_risks(patient_items)
+                st.session_state.care_plan = _cached_care_plan(patient_items)
                 
                 # Generate Watson AI insights
-                watson_ai = init_watson()
+                watson_ai = st.session_state.watson
                 st.session_state.watson_insights = watson_ai.generate_health_insights(
                     patient_data, st.session_state.risk_results
                 )
@@ -170,6 +303,7 @@ def main():
     with tab5:
         display_tools_resources()
 
+@st.fragment
 def display_risk_assessment():
     st.header("🎯 Individual Risk Assessment")
     
@@ -214,24 +348,11 @@ def display_risk_assessment():
     st.subheader("📈 Risk Breakdown")
     
     # Create risk comparison chart
-    risk_data = pd.DataFrame({
-        'Condition': ['Diabetes', 'Heart Disease', 'Hypertension'],
-        'Risk Percentage': [
-            risk_results['diabetes']['risk_percentage'],
-            risk_results['heart_disease']['risk_percentage'],
-            risk_results['hypertension']['risk_percentage']
-        ]
-    })
-    
-    fig = px.bar(
-        risk_data,
-        x='Condition',
-        y='Risk Percentage',
-        color='Risk Percentage',
-        color_continuous_scale='RdYlGn_r',
-        title="Risk Assessment Summary"
-    )
-    fig.update_layout(showlegend=False)
+    fig = build_risk_bar((
+        risk_results['diabetes']['risk_percentage'],
+        risk_results['heart_disease']['risk_percentage'],
+        risk_results['hypertension']['risk_percentage']
+    ))
     st.plotly_chart(fig, use_container_width=True)
     
     # Detailed Risk Factors
@@ -251,18 +372,19 @@ def display_risk_assessment():
             st.write(f"**Risk Level:** {result['risk_level']}")
     
     # Download report
-    if st.button("📄 Download Risk Assessment Report"):
-        report_data = {
-            'patient_data': st.session_state.patient_data,
-            'risk_results': st.session_state.risk_results,
-            'generated_at': datetime.now().isoformat()
-        }
-        
-        json_str = json.dumps(report_data, indent=2)
-        b64 = base64.b64encode(json_str.encode()).decode()
-        href = f'<a href="data:application/json;base64,{b64}" download="risk_assessment_report.json">Download Report</a>'
-        st.markdown(href, unsafe_allow_html=True)
+    report_data = {
+        'patient_data': st.session_state.patient_data,
+        'risk_results': st.session_state.risk_results,
+        'generated_at': datetime.now().isoformat()
+    }
+    st.download_button(
+        "📄 Download Risk Assessment Report",
+        data=to_json_bytes(report_data),
+        file_name="risk_assessment_report.json",
+        mime="application/json"
+    )
 
+@st.fragment
 def display_care_plan():
     st.header("📋 Personalized Care Plan")
     
@@ -309,12 +431,14 @@ def display_care_plan():
         st.write(f"• {resource}")
     
     # Download care plan
-    if st.button("📄 Download Care Plan"):
-        care_plan_json = json.dumps(care_plan, indent=2)
-        b64 = base64.b64encode(care_plan_json.encode()).decode()
-        href = f'<a href="data:application/json;base64,{b64}" download="care_plan.json">Download Care Plan</a>'
-        st.markdown(href, unsafe_allow_html=True)
+    st.download_button(
+        "📄 Download Care Plan",
+        data=to_json_bytes(care_plan),
+        file_name="care_plan.json",
+        mime="application/json"
+    )
 
+@st.fragment
 def display_watson_insights():
     st.header("🤖 Watson AI Health Insights")
     
@@ -352,15 +476,13 @@ def display_watson_insights():
         st.subheader("⚠️ Risk Factors Analysis")
         risk_factors_df = pd.DataFrame(insights['risk_factors_identified'])
         if not risk_factors_df.empty:
+            # Partial selection of the ten most relevant factors
+            if len(risk_factors_df) > 10:
+                top_idx = np.argpartition(risk_factors_df['relevance'].to_numpy(), -10)[-10:]
+                risk_factors_df = risk_factors_df.iloc[top_idx].sort_values('relevance', ascending=False)
+            
             # Create visualization
-            fig = px.bar(
-                risk_factors_df.head(10),
-                x='relevance',
-                y='factor',
-                color='sentiment',
-                orientation='h',
-                title="Top Risk Factors by Relevance"
-            )
+            fig = build_risk_factors_bar(risk_factors_df)
             st.plotly_chart(fig, use_container_width=True)
     
     # Sentiment Analysis
@@ -385,8 +507,10 @@ def display_watson_insights():
     
     # Watson Status
     st.subheader("🔧 AI Service Status")
-    watson_ai = init_watson()
-    if watson_ai.watson_available:
+    watson_ai = st.session_state.watson
+    if watson_ai.watson_available and not insights.get('watson_used', True):
+        st.info("ℹ️ IBM Watson AI is connected; these insights were generated locally without a Watson analysis")
+    elif watson_ai.watson_available:
         st.success("✅ IBM Watson AI is connected and analyzing your health data")
         st.write("**Active Watson Services:**")
         st.write("• Natural Language Understanding for health text analysis")
@@ -396,6 +520,7 @@ def display_watson_insights():
         st.warning("⚠️ Watson AI services are not fully configured")
         st.write("Enhanced AI features require proper Watson credentials setup.")
 
+@st.fragment
 def display_population_analytics():
     st.header("📊 Population Health Analytics")
     
@@ -412,25 +537,29 @@ def display_population_analytics():
         )
     
     with col2:
-        if st.button("📋 Generate Sample CSV"):
-            sample_csv = generate_sample_csv()
-            b64 = base64.b64encode(sample_csv.encode()).decode()
-            href = f'<a href="data:text/csv;base64,{b64}" download="sample_patient_data.csv">Download Sample CSV</a>'
-            st.markdown(href, unsafe_allow_html=True)
-            st.success("Sample CSV generated!")
+        st.download_button(
+            "📋 Download Sample CSV",
+            data=generate_sample_csv().encode(),
+            file_name="sample_patient_data.csv",
+            mime="text/csv"
+        )
     
     if uploaded_file is not None:
         try:
-            # Load and process data
-            df = pd.read_csv(uploaded_file)
-            st.success(f"✅ Successfully loaded {len(df)} patient records")
+            # Load and process data with Arrow's multithreaded CSV reader,
+            # cached on a digest of the uploaded bytes
+            file_bytes = uploaded_file.getvalue()
+            file_digest = hashlib.blake2b(file_bytes).digest()
+            processed_data = _cached_pop_processed(file_digest, file_bytes)
+            st.success(f"✅ Successfully loaded {len(processed_data)} patient records")
+            unscored = int((processed_data['overall_risk_level'] == 'Unknown').sum())
+            if unscored:
+                st.warning(f"⚠️ {unscored} records have missing or non-numeric health metrics and were not scored")
             
             # Initialize population analytics
+            from population_analytics import PopulationAnalytics
             pop_analytics = PopulationAnalytics()
             
-            # Process population data
-            processed_data = pop_analytics.process_population_data(df)
-            
             if processed_data is not None:
                 # Population Overview
                 st.subheader("👥 Population Overview")
@@ -445,11 +574,17 @@ def display_population_analytics():
                     st.metric("Average Age", f"{avg_age:.1f}")
                 
                 with col3:
-                    high_risk_count = len(processed_data[
-                        (processed_data['diabetes_risk'] >= 70) |
-                        (processed_data['heart_disease_risk'] >= 70) |
-                        (processed_data['hypertension_risk'] >= 70)
-                    ])
+                    # Single fused pass over the three risk columns
+                    risk_block = processed_data[
+                        ['diabetes_risk', 'heart_disease_risk', 'hypertension_risk']
+                    ].to_numpy(dtype=np.float32)
+                    if ne is not None:
+                        high_risk_count = int(ne.evaluate(
+                            'sum(where((a >= 70) | (b >= 70) | (c >= 70), 1, 0))',
+                            local_dict={'a': risk_block[:, 0], 'b': risk_block[:, 1], 'c': risk_block[:, 2]}
+                        ))
+                    else:
+                        high_risk_count = int((risk_block >= 70).any(axis=1).sum())
                     st.metric("High Risk Patients", high_risk_count)
                 
                 with col4:
@@ -462,71 +597,64 @@ def display_population_analytics():
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    # Risk level distribution
-                    risk_levels = []
-                    for _, row in processed_data.iterrows():
-                        max_risk = max([row['diabetes_risk'], row['heart_disease_risk'], row['hypertension_risk']])
-                        if max_risk >= 70:
-                            risk_levels.append('High')
-                        elif max_risk >= 40:
-                            risk_levels.append('Medium')
-                        else:
-                            risk_levels.append('Low')
+                    # Risk level distribution (vectorized over the row-wise max risk)
+                    max_risk = risk_block.max(axis=1)
+                    risk_levels = np.select(
+                        [max_risk >= 70, max_risk >= 40, np.isnan(max_risk)], ['High', 'Medium', 'Unknown'], default='Low'
+                    )
                     
-                    risk_df = pd.DataFrame({'Risk Level': risk_levels})
-                    risk_counts = risk_df['Risk Level'].value_counts()
+                    risk_counts = pd.Series(risk_levels, name='Risk Level').value_counts()
                     
-                    fig = px.pie(
-                        values=risk_counts.values,
-                        names=risk_counts.index,
-                        title="Overall Risk Level Distribution"
-                    )
+                    fig = build_risk_level_pie(risk_counts)
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
-                    # Age group risk analysis
-                    processed_data['age_group'] = pd.cut(
-                        processed_data['age'],
-                        bins=[0, 30, 50, 70, 100],
-                        labels=['<30', '30-50', '50-70', '70+']
-                    )
+                    # Age group risk analysis: integer bin ids for (0,30], (30,50], (50,70], (70,100]
+                    ages = processed_data['age'].to_numpy(dtype=np.float64, na_value=np.nan)
+                    in_range = (ages > 0) & (ages <= 100)
+                    age_bins = np.digitize(ages[in_range], [30, 50, 70], right=True)
+                    bin_counts = np.bincount(age_bins, minlength=4)
+                    observed = bin_counts > 0
                     
-                    age_risk = processed_data.groupby('age_group', observed=True)[
-                        ['diabetes_risk', 'heart_disease_risk', 'hypertension_risk']
-                    ].mean().reset_index()
+                    age_risk = pd.DataFrame({'age_group': np.array(['<30', '30-50', '50-70', '70+'])[observed]})
+                    for column in ['diabetes_risk', 'heart_disease_risk', 'hypertension_risk']:
+                        # Unscored (NaN) rows are left out of the group means
+                        risk_values = processed_data[column].to_numpy(dtype=np.float64, na_value=np.nan)[in_range]
+                        scored = ~np.isnan(risk_values)
+                        risk_sums = np.bincount(age_bins[scored], weights=risk_values[scored], minlength=4)
+                        scored_counts = np.bincount(age_bins[scored], minlength=4)
+                        with np.errstate(invalid='ignore'):
+                            age_risk[column] = risk_sums[observed] / scored_counts[observed]
                     
-                    fig = px.bar(
-                        age_risk,
-                        x='age_group',
-                        y=['diabetes_risk', 'heart_disease_risk', 'hypertension_risk'],
-                        title="Average Risk by Age Group",
-                        barmode='group'
-                    )
+                    fig = build_age_risk_bar(age_risk)
                     st.plotly_chart(fig, use_container_width=True)
                 
                 # Correlation Analysis
                 st.subheader("🔗 Risk Factor Correlations")
                 
-                correlation_vars = ['age', 'bmi', 'systolic_bp', 'glucose', 'cholesterol']
-                correlation_matrix = processed_data[correlation_vars].corr()
-                
-                fig = px.imshow(
-                    correlation_matrix,
-                    title="Health Metrics Correlation Matrix",
-                    color_continuous_scale='RdBu'
+                correlation_vars = ('age', 'bmi', 'systolic_bp', 'glucose', 'cholesterol')
+                metrics_block = np.ascontiguousarray(
+                    processed_data[list(correlation_vars)].to_numpy(dtype=np.float32, na_value=np.nan)
                 )
+                if np.isnan(metrics_block).any():
+                    # Pairwise-complete correlations so one missing value doesn't blank a whole row
+                    correlation_matrix = pd.DataFrame(metrics_block).corr().to_numpy(dtype=np.float32)
+                else:
+                    correlation_matrix = np.corrcoef(metrics_block, rowvar=False, dtype=np.float32)
+                
+                fig = build_correlation_heatmap(correlation_matrix, correlation_vars)
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Population Insights
                 st.subheader("💡 Population Health Insights")
-                insights = pop_analytics.generate_population_insights(processed_data)
+                insights = _cached_pop_insights(file_digest, processed_data)
                 
                 for insight in insights:
                     st.info(f"📌 {insight}")
                 
                 # Watson AI Population Analysis
                 st.subheader("🤖 Watson AI Population Analysis")
-                watson_ai = init_watson()
+                watson_ai = st.session_state.watson
                 pop_stats = pop_analytics.calculate_population_statistics(processed_data)
                 watson_pop_insights = watson_ai.analyze_population_trends(pop_stats)
                 
@@ -544,18 +672,38 @@ def display_population_analytics():
                         for pattern in watson_pop_insights['risk_patterns'][:5]:
                             st.write(f"• {pattern}")
                 
+                # Highest-risk patients share one batched Watson request
+                if watson_ai.watson_available and st.button("🧠 Watson Insights for Highest-Risk Patients"):
+                    top_idx = np.argsort(-max_risk, kind='stable')[:5]
+                    top_idx = top_idx[np.isfinite(max_risk[top_idx])]
+                    patients = processed_data.iloc[top_idx].to_dict('records')
+                    for patient in patients:
+                        for flag in ('family_diabetes', 'family_heart_disease', 'family_hypertension'):
+                            patient[flag] = patient[flag] is not pd.NA and bool(patient[flag])
+                    risks = [
+                        {condition: {'risk_percentage': float(patient[f'{condition}_risk'])}
+                         for condition in ('diabetes', 'heart_disease', 'hypertension')}
+                        for patient in patients
+                    ]
+                    for row, patient_insights in zip(top_idx, watson_ai.generate_health_insights_batch(patients, risks)):
+                        with st.expander(f"Patient {row + 1} ({max_risk[row]:.1f}% maximum risk)"):
+                            st.info(patient_insights['ai_summary'])
+                            for rec in patient_insights['priority_recommendations'][:3]:
+                                st.write(f"• {rec}")
+                
                 # Download enriched dataset
-                if st.button("📊 Download Enriched Dataset"):
-                    csv = processed_data.to_csv(index=False)
-                    b64 = base64.b64encode(csv.encode()).decode()
-                    href = f'<a href="data:text/csv;base64,{b64}" download="enriched_patient_data.csv">Download Enriched Data</a>'
-                    st.markdown(href, unsafe_allow_html=True)
-                    st.success("Enriched dataset ready for download!")
+                st.download_button(
+                    "📊 Download Enriched Dataset",
+                    data=_cached_enriched_csv(file_digest, processed_data),
+                    file_name="enriched_patient_data.csv",
+                    mime="text/csv"
+                )
         
         except Exception as e:
             st.error(f"Error processing uploaded file: {str(e)}")
             st.info("Please ensure your CSV file has the required columns. Use the sample CSV as a reference.")
 
+@st.fragment
 def display_tools_resources():
     st.header("🔧 Tools & Resources")
     
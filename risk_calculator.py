@@ -1,7 +1,362 @@
+import math
 import numpy as np
 import pandas as pd
+from dataclasses import dataclass
 from typing import Dict, Any
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+    
+    def njit(*args, **kwargs):
+        """
+        No-op stand-in for numba.njit when Numba is not installed
+        """
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Fixed feature order consumed by the compiled scoring kernels
+FEATURE_NAMES = (
+    'age', 'is_male', 'bmi', 'systolic_bp', 'diastolic_bp', 'glucose', 'cholesterol',
+    'hdl', 'ldl', 'smoking_code', 'exercise_days', 'alcohol_drinks',
+    'family_diabetes', 'family_heart_disease', 'family_hypertension'
+)
+(_AGE, _IS_MALE, _BMI, _SYSTOLIC, _DIASTOLIC, _GLUCOSE, _CHOLESTEROL,
+ _HDL, _LDL, _SMOKING, _EXERCISE, _ALCOHOL,
+ _FAMILY_DIABETES, _FAMILY_HEART, _FAMILY_HYPERTENSION) = range(len(FEATURE_NAMES))
+
+SMOKING_CODES = {'Never': 0, 'Former': 1, 'Current': 2}
+
+# Risk levels indexed by (pct >= low threshold) + (pct >= medium threshold)
+RISK_LEVELS = ('Low', 'Medium', 'High')
+_RISK_LEVEL_ARRAY = np.array(RISK_LEVELS, dtype=object)
+
+# Factor names in the order the kernels fill their output arrays
+DIABETES_FACTORS = (
+    'age_risk', 'bmi_risk', 'glucose_risk', 'bp_risk', 'exercise_risk',
+    'smoking_risk', 'family_history_risk', 'hdl_risk'
+)
+HEART_DISEASE_FACTORS = (
+    'age_gender_risk', 'cholesterol_risk', 'ldl_risk', 'hdl_risk', 'bp_risk',
+    'smoking_risk', 'diabetes_risk', 'family_history_risk', 'bmi_risk', 'exercise_risk'
+)
+HYPERTENSION_FACTORS = (
+    'current_bp_risk', 'age_risk', 'bmi_risk', 'alcohol_risk', 'smoking_risk',
+    'family_history_risk', 'exercise_risk', 'diabetes_risk'
+)
+
+def encode_patient_features(patient_data: Dict[str, Any]) -> np.ndarray:
+    """
+    Convert a patient data dict into the fixed-order float64 feature vector
+    """
+    return np.array([
+        patient_data['age'],
+        1.0 if patient_data['gender'] == 'Male' else 0.0,
+        patient_data['bmi'],
+        patient_data['systolic_bp'],
+        patient_data['diastolic_bp'],
+        patient_data['glucose'],
+        patient_data['cholesterol'],
+        patient_data['hdl'],
+        patient_data['ldl'],
+        SMOKING_CODES.get(patient_data['smoking'], 0),
+        patient_data['exercise_days'],
+        patient_data['alcohol_drinks'],
+        1.0 if patient_data['family_diabetes'] else 0.0,
+        1.0 if patient_data['family_heart_disease'] else 0.0,
+        1.0 if patient_data['family_hypertension'] else 0.0
+    ], dtype=np.float64)
+
+@dataclass
+class PatientBatch:
+    """
+    Structure-of-arrays patient batch: one contiguous float64 column per FEATURE_NAMES entry
+    """
+    age: np.ndarray
+    is_male: np.ndarray
+    bmi: np.ndarray
+    systolic_bp: np.ndarray
+    diastolic_bp: np.ndarray
+    glucose: np.ndarray
+    cholesterol: np.ndarray
+    hdl: np.ndarray
+    ldl: np.ndarray
+    smoking_code: np.ndarray
+    exercise_days: np.ndarray
+    alcohol_drinks: np.ndarray
+    family_diabetes: np.ndarray
+    family_heart_disease: np.ndarray
+    family_hypertension: np.ndarray
+    
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'PatientBatch':
+        """
+        Encode a patient DataFrame column by column
+        """
+        def numeric(col):
+            return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        def flag(col):
+            # Blank cells read as NA under the Arrow backend; treat them as False
+            return df[col].fillna(False).astype(bool).to_numpy(dtype=np.float64)
+        
+        def smoking_code():
+            smoking = df['smoking']
+            if isinstance(smoking.dtype, pd.CategoricalDtype):
+                # Map the few categories once and gather by category code;
+                # the trailing 0.0 covers missing values (code -1)
+                category_codes = pd.Series(smoking.cat.categories).astype(object).map(SMOKING_CODES).fillna(0)
+                lookup = np.append(category_codes.to_numpy(dtype=np.float64), 0.0)
+                return lookup[smoking.cat.codes.to_numpy()]
+            return smoking.astype(object).map(SMOKING_CODES).fillna(0).to_numpy(dtype=np.float64)
+        
+        return cls(
+            age=numeric('age'),
+            is_male=(df['gender'] == 'Male').to_numpy(dtype=np.float64, na_value=0.0),
+            bmi=numeric('bmi'),
+            systolic_bp=numeric('systolic_bp'),
+            diastolic_bp=numeric('diastolic_bp'),
+            glucose=numeric('glucose'),
+            cholesterol=numeric('cholesterol'),
+            hdl=numeric('hdl'),
+            ldl=numeric('ldl'),
+            smoking_code=smoking_code(),
+            exercise_days=numeric('exercise_days'),
+            alcohol_drinks=numeric('alcohol_drinks'),
+            family_diabetes=flag('family_diabetes'),
+            family_heart_disease=flag('family_heart_disease'),
+            family_hypertension=flag('family_hypertension')
+        )
+    
+    @classmethod
+    def from_features(cls, features: np.ndarray) -> 'PatientBatch':
+        """
+        View the columns of an (n_patients, n_features) feature matrix as a batch
+        """
+        return cls(*features.T)
+    
+    def to_features(self) -> np.ndarray:
+        """
+        Stack the columns into the row-per-patient matrix consumed by the compiled kernels
+        """
+        return np.column_stack([getattr(self, name) for name in FEATURE_NAMES])
+
+def encode_population_features(df: pd.DataFrame) -> np.ndarray:
+    """
+    Convert a patient DataFrame into an (n_patients, n_features) float64 feature matrix
+    """
+    return PatientBatch.from_dataframe(df).to_features()
+
+# Band lookup tables: a value's points are PTS[np.searchsorted(THR, value, side='right')],
+# so each threshold opens the next band at ">=" (or closes it at "<")
+_DIAB_AGE_THR = np.array([35.0, 45.0, 65.0])
+_DIAB_AGE_PTS = np.array([0.0, 1.0, 2.0, 3.0])
+_DIAB_BMI_THR = np.array([25.0, 30.0, 35.0])
+_DIAB_BMI_PTS = np.array([0.0, 2.0, 3.0, 4.0])
+_DIAB_GLUCOSE_THR = np.array([90.0, 100.0, 126.0])
+_DIAB_GLUCOSE_PTS = np.array([0.0, 1.0, 3.0, 5.0])
+_DIAB_BP_THR = np.array([120.0, 130.0, 140.0])
+_DIAB_BP_PTS = np.array([0.0, 1.0, 1.5, 2.0])
+_DIAB_EXERCISE_THR = np.array([2.0, 4.0])
+_DIAB_EXERCISE_PTS = np.array([2.0, 1.0, 0.0])
+_DIAB_SMOKING_PTS = np.array([0.0, 1.0, 2.5])
+_DIAB_HDL_THR = np.array([35.0, 40.0])
+_DIAB_HDL_PTS = np.array([2.0, 1.0, 0.0])
+
+_HEART_AGE_MALE_THR = np.array([45.0, 55.0])
+_HEART_AGE_FEMALE_THR = np.array([55.0, 65.0])
+_HEART_AGE_PTS = np.array([0.0, 2.0, 3.0])
+_HEART_CHOLESTEROL_THR = np.array([200.0, 240.0])
+_HEART_CHOLESTEROL_PTS = np.array([0.0, 2.0, 3.0])
+_HEART_LDL_THR = np.array([100.0, 130.0, 160.0])
+_HEART_LDL_PTS = np.array([0.0, 1.0, 2.0, 3.0])
+_HEART_HDL_THR = np.array([35.0, 40.0, 60.0])
+_HEART_HDL_PTS = np.array([3.0, 2.0, 0.0, -1.0])
+_HEART_BP_THR = np.array([120.0, 130.0, 140.0, 160.0])
+_HEART_BP_PTS = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+_HEART_SMOKING_PTS = np.array([0.0, 1.5, 4.0])
+_HEART_GLUCOSE_THR = np.array([100.0, 126.0])
+_HEART_GLUCOSE_PTS = np.array([0.0, 1.5, 3.0])
+_HEART_BMI_THR = np.array([25.0, 30.0])
+_HEART_BMI_PTS = np.array([0.0, 1.0, 2.0])
+_HEART_EXERCISE_THR = np.array([2.0, 3.0, 5.0])
+_HEART_EXERCISE_PTS = np.array([1.5, 0.0, -0.5, -1.0])
+
+_HTN_SYSTOLIC_THR = np.array([120.0, 130.0, 140.0])
+_HTN_SYSTOLIC_PTS = np.array([0.0, 1.5, 3.0, 5.0])
+_HTN_DIASTOLIC_THR = np.array([80.0, 90.0])
+_HTN_DIASTOLIC_PTS = np.array([0.0, 3.0, 5.0])
+_HTN_AGE_THR = np.array([45.0, 55.0, 65.0])
+_HTN_AGE_PTS = np.array([0.0, 1.0, 2.0, 3.0])
+_HTN_BMI_THR = np.array([25.0, 30.0, 35.0])
+_HTN_BMI_PTS = np.array([0.0, 1.5, 2.5, 3.5])
+_HTN_ALCOHOL_THR = np.array([7.0, 14.0])  # strict ">" bands, looked up with side='left'
+_HTN_ALCOHOL_PTS = np.array([0.0, 1.0, 2.0])
+_HTN_SMOKING_PTS = np.array([0.0, 1.0, 2.5])
+_HTN_EXERCISE_THR = np.array([2.0, 3.0, 5.0])
+_HTN_EXERCISE_PTS = np.array([1.5, 0.0, -1.0, -1.5])
+_HTN_GLUCOSE_THR = np.array([100.0, 126.0])
+_HTN_GLUCOSE_PTS = np.array([0.0, 1.0, 2.0])
+
+# Every factor is a multiple of half a point, so total scores fall on a half-point
+# grid and the sigmoid percentages of that grid are precomputed once per scale
+_SIGMOID_GRID = np.arange(-20, 101) / 2.0
+_SIGMOID_TABLE = {
+    (scale, score): pct
+    for scale in (8.0, 10.0)
+    for score, pct in zip(_SIGMOID_GRID.tolist(), (100.0 / (1.0 + np.exp(-_SIGMOID_GRID / scale))).tolist())
+}
+
+@njit('float64(float64, float64)', cache=True)
+def _sigmoid(score, scale):
+    return 100.0 / (1.0 + math.exp(-score / scale))
+
+@njit('float64[:](float64[:])', cache=True)
+def _diabetes_factors(x):
+    """
+    Diabetes risk factor points, ordered as DIABETES_FACTORS
+    """
+    f = np.empty(8)
+    f[0] = _DIAB_AGE_PTS[np.searchsorted(_DIAB_AGE_THR, x[_AGE], side='right')]
+    f[1] = _DIAB_BMI_PTS[np.searchsorted(_DIAB_BMI_THR, x[_BMI], side='right')]
+    f[2] = _DIAB_GLUCOSE_PTS[np.searchsorted(_DIAB_GLUCOSE_THR, x[_GLUCOSE], side='right')]
+    f[3] = _DIAB_BP_PTS[np.searchsorted(_DIAB_BP_THR, x[_SYSTOLIC], side='right')]
+    f[4] = _DIAB_EXERCISE_PTS[np.searchsorted(_DIAB_EXERCISE_THR, x[_EXERCISE], side='right')]
+    f[5] = _DIAB_SMOKING_PTS[int(x[_SMOKING])]
+    f[6] = 3.0 * x[_FAMILY_DIABETES]
+    f[7] = _DIAB_HDL_PTS[np.searchsorted(_DIAB_HDL_THR, x[_HDL], side='right')]
+    return f
+
+@njit('float64[:](float64[:])', cache=True)
+def _heart_disease_factors(x):
+    """
+    Heart disease risk factor points, ordered as HEART_DISEASE_FACTORS
+    """
+    f = np.empty(10)
+    
+    # Age bands start ten years later for women
+    if x[_IS_MALE]:
+        f[0] = _HEART_AGE_PTS[np.searchsorted(_HEART_AGE_MALE_THR, x[_AGE], side='right')]
+    else:
+        f[0] = _HEART_AGE_PTS[np.searchsorted(_HEART_AGE_FEMALE_THR, x[_AGE], side='right')]
+    
+    f[1] = _HEART_CHOLESTEROL_PTS[np.searchsorted(_HEART_CHOLESTEROL_THR, x[_CHOLESTEROL], side='right')]
+    f[2] = _HEART_LDL_PTS[np.searchsorted(_HEART_LDL_THR, x[_LDL], side='right')]
+    f[3] = _HEART_HDL_PTS[np.searchsorted(_HEART_HDL_THR, x[_HDL], side='right')]
+    f[4] = _HEART_BP_PTS[np.searchsorted(_HEART_BP_THR, x[_SYSTOLIC], side='right')]
+    f[5] = _HEART_SMOKING_PTS[int(x[_SMOKING])]
+    f[6] = _HEART_GLUCOSE_PTS[np.searchsorted(_HEART_GLUCOSE_THR, x[_GLUCOSE], side='right')]
+    f[7] = 2.5 * x[_FAMILY_HEART]
+    f[8] = _HEART_BMI_PTS[np.searchsorted(_HEART_BMI_THR, x[_BMI], side='right')]
+    f[9] = _HEART_EXERCISE_PTS[np.searchsorted(_HEART_EXERCISE_THR, x[_EXERCISE], side='right')]
+    return f
+
+@njit('float64[:](float64[:])', cache=True)
+def _hypertension_factors(x):
+    """
+    Hypertension risk factor points, ordered as HYPERTENSION_FACTORS
+    """
+    f = np.empty(8)
+    
+    # Current blood pressure status: the worse of the systolic and diastolic bands
+    f[0] = max(
+        _HTN_SYSTOLIC_PTS[np.searchsorted(_HTN_SYSTOLIC_THR, x[_SYSTOLIC], side='right')],
+        _HTN_DIASTOLIC_PTS[np.searchsorted(_HTN_DIASTOLIC_THR, x[_DIASTOLIC], side='right')]
+    )
+    
+    f[1] = _HTN_AGE_PTS[np.searchsorted(_HTN_AGE_THR, x[_AGE], side='right')]
+    f[2] = _HTN_BMI_PTS[np.searchsorted(_HTN_BMI_THR, x[_BMI], side='right')]
+    f[3] = _HTN_ALCOHOL_PTS[np.searchsorted(_HTN_ALCOHOL_THR, x[_ALCOHOL], side='left')]
+    f[4] = _HTN_SMOKING_PTS[int(x[_SMOKING])]
+    f[5] = 2.5 * x[_FAMILY_HYPERTENSION]
+    f[6] = _HTN_EXERCISE_PTS[np.searchsorted(_HTN_EXERCISE_THR, x[_EXERCISE], side='right')]
+    f[7] = _HTN_GLUCOSE_PTS[np.searchsorted(_HTN_GLUCOSE_THR, x[_GLUCOSE], side='right')]
+    return f
+
+@njit('float64[:](float64[:])', cache=True)
+def score_features(x):
+    """
+    Diabetes, heart disease and hypertension risk percentages for one feature vector
+    """
+    out = np.empty(3)
+    out[0] = _sigmoid(_diabetes_factors(x).sum(), 8.0)
+    out[1] = _sigmoid(_heart_disease_factors(x).sum(), 10.0)
+    out[2] = _sigmoid(_hypertension_factors(x).sum(), 8.0)
+    return out
+
+def _bands(thresholds: np.ndarray, points: np.ndarray, values: np.ndarray, side: str = 'right') -> np.ndarray:
+    """
+    Look up band points for a whole column of values
+    """
+    return points[np.searchsorted(thresholds, values, side=side)]
+
+def score_patient_batch(batch: PatientBatch) -> np.ndarray:
+    """
+    Vectorized NumPy counterpart of score_features, scoring a PatientBatch column by column
+    """
+    age = batch.age
+    bmi = batch.bmi
+    systolic = batch.systolic_bp
+    glucose = batch.glucose
+    hdl = batch.hdl
+    exercise_days = batch.exercise_days
+    smoking = batch.smoking_code.astype(np.intp)
+    
+    diabetes = (
+        _bands(_DIAB_AGE_THR, _DIAB_AGE_PTS, age)
+        + _bands(_DIAB_BMI_THR, _DIAB_BMI_PTS, bmi)
+        + _bands(_DIAB_GLUCOSE_THR, _DIAB_GLUCOSE_PTS, glucose)
+        + _bands(_DIAB_BP_THR, _DIAB_BP_PTS, systolic)
+        + _bands(_DIAB_EXERCISE_THR, _DIAB_EXERCISE_PTS, exercise_days)
+        + _DIAB_SMOKING_PTS[smoking]
+        + 3.0 * batch.family_diabetes
+        + _bands(_DIAB_HDL_THR, _DIAB_HDL_PTS, hdl)
+    )
+    
+    heart_disease = (
+        np.where(
+            batch.is_male != 0,
+            _bands(_HEART_AGE_MALE_THR, _HEART_AGE_PTS, age),
+            _bands(_HEART_AGE_FEMALE_THR, _HEART_AGE_PTS, age)
+        )
+        + _bands(_HEART_CHOLESTEROL_THR, _HEART_CHOLESTEROL_PTS, batch.cholesterol)
+        + _bands(_HEART_LDL_THR, _HEART_LDL_PTS, batch.ldl)
+        + _bands(_HEART_HDL_THR, _HEART_HDL_PTS, hdl)
+        + _bands(_HEART_BP_THR, _HEART_BP_PTS, systolic)
+        + _HEART_SMOKING_PTS[smoking]
+        + _bands(_HEART_GLUCOSE_THR, _HEART_GLUCOSE_PTS, glucose)
+        + 2.5 * batch.family_heart_disease
+        + _bands(_HEART_BMI_THR, _HEART_BMI_PTS, bmi)
+        + _bands(_HEART_EXERCISE_THR, _HEART_EXERCISE_PTS, exercise_days)
+    )
+    
+    hypertension = (
+        np.maximum(
+            _bands(_HTN_SYSTOLIC_THR, _HTN_SYSTOLIC_PTS, systolic),
+            _bands(_HTN_DIASTOLIC_THR, _HTN_DIASTOLIC_PTS, batch.diastolic_bp)
+        )
+        + _bands(_HTN_AGE_THR, _HTN_AGE_PTS, age)
+        + _bands(_HTN_BMI_THR, _HTN_BMI_PTS, bmi)
+        + _bands(_HTN_ALCOHOL_THR, _HTN_ALCOHOL_PTS, batch.alcohol_drinks, side='left')
+        + _HTN_SMOKING_PTS[smoking]
+        + 2.5 * batch.family_hypertension
+        + _bands(_HTN_EXERCISE_THR, _HTN_EXERCISE_PTS, exercise_days)
+        + _bands(_HTN_GLUCOSE_THR, _HTN_GLUCOSE_PTS, glucose)
+    )
+    
+    scores = np.column_stack([diabetes / 8.0, heart_disease / 10.0, hypertension / 8.0])
+    return 100.0 / (1.0 + np.exp(-scores))
+
+def score_features_batch(features: np.ndarray) -> np.ndarray:
+    """
+    Score an (n_patients, n_features) feature matrix with the vectorized scorer
+    """
+    return score_patient_batch(PatientBatch.from_features(features))
+
 class RiskCalculator:
     """
     Comprehensive risk calculator for diabetes, heart disease, and hypertension
@@ -13,363 +368,93 @@ class RiskCalculator:
             'low': 40,
             'medium': 70
         }
+        # Scalar copies keep dict lookups out of the per-result path
+        self._thr_low = self.risk_thresholds['low']
+        self._thr_med = self.risk_thresholds['medium']
     
     def sigmoid_transform(self, score: float, scale: float = 10.0) -> float:
         """
         Transform raw risk score to percentage using sigmoid function
         """
-        return 100 / (1 + np.exp(-score / scale))
+        if isinstance(score, np.ndarray):
+            return 100 / (1 + np.exp(-score / scale))
+        
+        risk_percentage = _SIGMOID_TABLE.get((scale, score))
+        if risk_percentage is None:
+            risk_percentage = 100 / (1 + math.exp(-score / scale))
+        return risk_percentage
     
-    def calculate_diabetes_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_result(self, factor_names: tuple, factors: np.ndarray, scale: float) -> Dict[str, Any]:
         """
-        Calculate diabetes risk based on multiple factors
+        Wrap kernel factor points into the named risk result dict
         """
-        risk_factors = {}
-        
-        # Age factor
-        age = patient_data['age']
-        if age >= 65:
-            risk_factors['age_risk'] = 3.0
-        elif age >= 45:
-            risk_factors['age_risk'] = 2.0
-        elif age >= 35:
-            risk_factors['age_risk'] = 1.0
-        else:
-            risk_factors['age_risk'] = 0.0
-        
-        # BMI factor
-        bmi = patient_data['bmi']
-        if bmi >= 35:
-            risk_factors['bmi_risk'] = 4.0
-        elif bmi >= 30:
-            risk_factors['bmi_risk'] = 3.0
-        elif bmi >= 25:
-            risk_factors['bmi_risk'] = 2.0
-        else:
-            risk_factors['bmi_risk'] = 0.0
-        
-        # Glucose factor
-        glucose = patient_data['glucose']
-        if glucose >= 126:
-            risk_factors['glucose_risk'] = 5.0
-        elif glucose >= 100:
-            risk_factors['glucose_risk'] = 3.0
-        elif glucose >= 90:
-            risk_factors['glucose_risk'] = 1.0
-        else:
-            risk_factors['glucose_risk'] = 0.0
-        
-        # Blood pressure factor
-        systolic = patient_data['systolic_bp']
-        if systolic >= 140:
-            risk_factors['bp_risk'] = 2.0
-        elif systolic >= 130:
-            risk_factors['bp_risk'] = 1.5
-        elif systolic >= 120:
-            risk_factors['bp_risk'] = 1.0
-        else:
-            risk_factors['bp_risk'] = 0.0
-        
-        # Lifestyle factors
-        exercise_days = patient_data['exercise_days']
-        if exercise_days < 2:
-            risk_factors['exercise_risk'] = 2.0
-        elif exercise_days < 4:
-            risk_factors['exercise_risk'] = 1.0
-        else:
-            risk_factors['exercise_risk'] = 0.0
-        
-        # Smoking factor
-        smoking = patient_data['smoking']
-        if smoking == 'Current':
-            risk_factors['smoking_risk'] = 2.5
-        elif smoking == 'Former':
-            risk_factors['smoking_risk'] = 1.0
-        else:
-            risk_factors['smoking_risk'] = 0.0
-        
-        # Family history
-        if patient_data['family_diabetes']:
-            risk_factors['family_history_risk'] = 3.0
-        else:
-            risk_factors['family_history_risk'] = 0.0
-        
-        # HDL cholesterol factor
-        hdl = patient_data['hdl']
-        if hdl < 35:
-            risk_factors['hdl_risk'] = 2.0
-        elif hdl < 40:
-            risk_factors['hdl_risk'] = 1.0
-        else:
-            risk_factors['hdl_risk'] = 0.0
+        points = factors.tolist()
+        risk_factors = dict(zip(factor_names, points))
         
         # Calculate total score
-        total_score = sum(risk_factors.values())
+        total_score = sum(points)
         
         # Transform to percentage
-        risk_percentage = self.sigmoid_transform(total_score, scale=8.0)
-        
-        # Determine risk level
-        if risk_percentage >= self.risk_thresholds['medium']:
-            risk_level = 'High'
-        elif risk_percentage >= self.risk_thresholds['low']:
-            risk_level = 'Medium'
-        else:
-            risk_level = 'Low'
+        risk_percentage = self.sigmoid_transform(total_score, scale)
         
         return {
             'risk_factors': risk_factors,
             'total_score': total_score,
             'risk_percentage': risk_percentage,
-            'risk_level': risk_level
+            'risk_level': self._bucket(risk_percentage)
         }
     
+    def _bucket(self, risk_percentage: float) -> str:
+        """
+        Determine risk level for a risk percentage (or an array of them)
+        """
+        if isinstance(risk_percentage, np.ndarray):
+            level_idx = (risk_percentage >= self._thr_low).astype(np.intp) + (risk_percentage >= self._thr_med)
+            return _RISK_LEVEL_ARRAY[level_idx]
+        return RISK_LEVELS[int(risk_percentage >= self._thr_low) + int(risk_percentage >= self._thr_med)]
+    
+    def calculate_diabetes_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Calculate diabetes risk based on multiple factors
+        """
+        factors = _diabetes_factors(encode_patient_features(patient_data))
+        return self._build_result(DIABETES_FACTORS, factors, scale=8.0)
+    
     def calculate_heart_disease_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Calculate heart disease risk based on cardiovascular factors
         """
-        risk_factors = {}
-        
-        # Age and gender factor
-        age = patient_data['age']
-        gender = patient_data['gender']
-        
-        if gender == 'Male':
-            if age >= 55:
-                risk_factors['age_gender_risk'] = 3.0
-            elif age >= 45:
-                risk_factors['age_gender_risk'] = 2.0
-            else:
-                risk_factors['age_gender_risk'] = 0.0
-        else:  # Female
-            if age >= 65:
-                risk_factors['age_gender_risk'] = 3.0
-            elif age >= 55:
-                risk_factors['age_gender_risk'] = 2.0
-            else:
-                risk_factors['age_gender_risk'] = 0.0
-        
-        # Cholesterol factors
-        cholesterol = patient_data['cholesterol']
-        if cholesterol >= 240:
-            risk_factors['cholesterol_risk'] = 3.0
-        elif cholesterol >= 200:
-            risk_factors['cholesterol_risk'] = 2.0
-        else:
-            risk_factors['cholesterol_risk'] = 0.0
-        
-        # LDL factor
-        ldl = patient_data['ldl']
-        if ldl >= 160:
-            risk_factors['ldl_risk'] = 3.0
-        elif ldl >= 130:
-            risk_factors['ldl_risk'] = 2.0
-        elif ldl >= 100:
-            risk_factors['ldl_risk'] = 1.0
-        else:
-            risk_factors['ldl_risk'] = 0.0
-        
-        # HDL factor (protective)
-        hdl = patient_data['hdl']
-        if hdl < 35:
-            risk_factors['hdl_risk'] = 3.0
-        elif hdl < 40:
-            risk_factors['hdl_risk'] = 2.0
-        elif hdl >= 60:
-            risk_factors['hdl_risk'] = -1.0  # Protective factor
-        else:
-            risk_factors['hdl_risk'] = 0.0
-        
-        # Blood pressure factor
-        systolic = patient_data['systolic_bp']
-        if systolic >= 160:
-            risk_factors['bp_risk'] = 4.0
-        elif systolic >= 140:
-            risk_factors['bp_risk'] = 3.0
-        elif systolic >= 130:
-            risk_factors['bp_risk'] = 2.0
-        elif systolic >= 120:
-            risk_factors['bp_risk'] = 1.0
-        else:
-            risk_factors['bp_risk'] = 0.0
-        
-        # Smoking factor
-        smoking = patient_data['smoking']
-        if smoking == 'Current':
-            risk_factors['smoking_risk'] = 4.0
-        elif smoking == 'Former':
-            risk_factors['smoking_risk'] = 1.5
-        else:
-            risk_factors['smoking_risk'] = 0.0
-        
-        # Diabetes risk factor
-        glucose = patient_data['glucose']
-        if glucose >= 126:
-            risk_factors['diabetes_risk'] = 3.0
-        elif glucose >= 100:
-            risk_factors['diabetes_risk'] = 1.5
-        else:
-            risk_factors['diabetes_risk'] = 0.0
-        
-        # Family history
-        if patient_data['family_heart_disease']:
-            risk_factors['family_history_risk'] = 2.5
-        else:
-            risk_factors['family_history_risk'] = 0.0
-        
-        # BMI factor
-        bmi = patient_data['bmi']
-        if bmi >= 30:
-            risk_factors['bmi_risk'] = 2.0
-        elif bmi >= 25:
-            risk_factors['bmi_risk'] = 1.0
-        else:
-            risk_factors['bmi_risk'] = 0.0
-        
-        # Exercise factor (protective)
-        exercise_days = patient_data['exercise_days']
-        if exercise_days >= 5:
-            risk_factors['exercise_risk'] = -1.0  # Protective
-        elif exercise_days >= 3:
-            risk_factors['exercise_risk'] = -0.5  # Protective
-        elif exercise_days < 2:
-            risk_factors['exercise_risk'] = 1.5
-        else:
-            risk_factors['exercise_risk'] = 0.0
-        
-        # Calculate total score
-        total_score = sum(risk_factors.values())
-        
-        # Transform to percentage
-        risk_percentage = self.sigmoid_transform(total_score, scale=10.0)
-        
-        # Determine risk level
-        if risk_percentage >= self.risk_thresholds['medium']:
-            risk_level = 'High'
-        elif risk_percentage >= self.risk_thresholds['low']:
-            risk_level = 'Medium'
-        else:
-            risk_level = 'Low'
-        
-        return {
-            'risk_factors': risk_factors,
-            'total_score': total_score,
-            'risk_percentage': risk_percentage,
-            'risk_level': risk_level
-        }
+        factors = _heart_disease_factors(encode_patient_features(patient_data))
+        return self._build_result(HEART_DISEASE_FACTORS, factors, scale=10.0)
     
     def calculate_hypertension_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Calculate hypertension risk based on blood pressure and related factors
         """
-        risk_factors = {}
-        
-        # Current blood pressure status
-        systolic = patient_data['systolic_bp']
-        diastolic = patient_data['diastolic_bp']
-        
-        if systolic >= 140 or diastolic >= 90:
-            risk_factors['current_bp_risk'] = 5.0  # Already hypertensive
-        elif systolic >= 130 or diastolic >= 80:
-            risk_factors['current_bp_risk'] = 3.0  # Stage 1
-        elif systolic >= 120:
-            risk_factors['current_bp_risk'] = 1.5  # Elevated
-        else:
-            risk_factors['current_bp_risk'] = 0.0
-        
-        # Age factor
-        age = patient_data['age']
-        if age >= 65:
-            risk_factors['age_risk'] = 3.0
-        elif age >= 55:
-            risk_factors['age_risk'] = 2.0
-        elif age >= 45:
-            risk_factors['age_risk'] = 1.0
-        else:
-            risk_factors['age_risk'] = 0.0
-        
-        # BMI factor
-        bmi = patient_data['bmi']
-        if bmi >= 35:
-            risk_factors['bmi_risk'] = 3.5
-        elif bmi >= 30:
-            risk_factors['bmi_risk'] = 2.5
-        elif bmi >= 25:
-            risk_factors['bmi_risk'] = 1.5
-        else:
-            risk_factors['bmi_risk'] = 0.0
-        
-        # Sodium intake proxy (alcohol consumption)
-        alcohol_drinks = patient_data['alcohol_drinks']
-        if alcohol_drinks > 14:  # Excessive alcohol
-            risk_factors['alcohol_risk'] = 2.0
-        elif alcohol_drinks > 7:
-            risk_factors['alcohol_risk'] = 1.0
-        else:
-            risk_factors['alcohol_risk'] = 0.0
-        
-        # Smoking factor
-        smoking = patient_data['smoking']
-        if smoking == 'Current':
-            risk_factors['smoking_risk'] = 2.5
-        elif smoking == 'Former':
-            risk_factors['smoking_risk'] = 1.0
-        else:
-            risk_factors['smoking_risk'] = 0.0
-        
-        # Family history
-        if patient_data['family_hypertension']:
-            risk_factors['family_history_risk'] = 2.5
-        else:
-            risk_factors['family_history_risk'] = 0.0
-        
-        # Exercise factor (protective)
-        exercise_days = patient_data['exercise_days']
-        if exercise_days >= 5:
-            risk_factors['exercise_risk'] = -1.5  # Protective
-        elif exercise_days >= 3:
-            risk_factors['exercise_risk'] = -1.0  # Protective
-        elif exercise_days < 2:
-            risk_factors['exercise_risk'] = 1.5
-        else:
-            risk_factors['exercise_risk'] = 0.0
-        
-        # Diabetes/glucose factor
-        glucose = patient_data['glucose']
-        if glucose >= 126:
-            risk_factors['diabetes_risk'] = 2.0
-        elif glucose >= 100:
-            risk_factors['diabetes_risk'] = 1.0
-        else:
-            risk_factors['diabetes_risk'] = 0.0
-        
-        # Calculate total score
-        total_score = sum(risk_factors.values())
-        
-        # Transform to percentage
-        risk_percentage = self.sigmoid_transform(total_score, scale=8.0)
-        
-        # Determine risk level
-        if risk_percentage >= self.risk_thresholds['medium']:
-            risk_level = 'High'
-        elif risk_percentage >= self.risk_thresholds['low']:
-            risk_level = 'Medium'
-        else:
-            risk_level = 'Low'
-        
-        return {
-            'risk_factors': risk_factors,
-            'total_score': total_score,
-            'risk_percentage': risk_percentage,
-            'risk_level': risk_level
-        }
+        factors = _hypertension_factors(encode_patient_features(patient_data))
+        return self._build_result(HYPERTENSION_FACTORS, factors, scale=8.0)
     
     def calculate_all_risks(self, patient_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         """
         Calculate all risk assessments for a patient
         """
+        # Encode once and share the feature vector across the three kernels
+        features = encode_patient_features(patient_data)
         return {
-            'diabetes': self.calculate_diabetes_risk(patient_data),
-            'heart_disease': self.calculate_heart_disease_risk(patient_data),
-            'hypertension': self.calculate_hypertension_risk(patient_data)
+            'diabetes': self._build_result(DIABETES_FACTORS, _diabetes_factors(features), scale=8.0),
+            'heart_disease': self._build_result(HEART_DISEASE_FACTORS, _heart_disease_factors(features), scale=10.0),
+            'hypertension': self._build_result(HYPERTENSION_FACTORS, _hypertension_factors(features), scale=8.0)
         }
+    
+    def calculate_all_risks_batch(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calculate all risk percentages and levels for every patient in a DataFrame at once
+        """
+        risk_scores = score_patient_batch(PatientBatch.from_dataframe(df))
+        
+        result = pd.DataFrame(index=df.index)
+        for i, condition in enumerate(['diabetes', 'heart_disease', 'hypertension']):
+            risk_percentage = risk_scores[:, i]
+            result[f'{condition}_risk'] = risk_percentage
+            result[f'{condition}_risk_level'] = self._bucket(risk_percentage)
+        return result
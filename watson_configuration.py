@@ -1,129 +1,537 @@
 import os
 import json
-from typing import Dict, Any, List, Optional
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from bisect import bisect_right
+from typing import Dict, Any, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 from ibm_watson import NaturalLanguageUnderstandingV1, AssistantV2
 from ibm_watson.natural_language_understanding_v1 import Features, EntitiesOptions, KeywordsOptions, SentimentOptions
 from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from ibm_cloud_sdk_core import DetailedResponse
 import streamlit as st
+from risk_calculator import RiskCalculator
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Watson credentials are read once at import
+_API_KEY = os.getenv('IBM_WATSON_API_KEY')
+_SERVICE_URL = os.getenv('IBM_WATSON_URL')
+_SERVICE_INSTANCE_ID = os.getenv('IBM_WATSON_SERVICE_INSTANCE_ID')
+
+# Patients below this maximum risk (%) with no major lifestyle factors skip Watson;
+# defaults to the top of the calculator's Low band
+_LOW_RISK_THRESHOLD = float(os.getenv('WATSON_LOW_RISK_THRESHOLD', RiskCalculator().risk_thresholds['low']))
+
+_NLU_VERSION = '2022-04-07'
+
+# Concurrent requests allowed per cohort in the async path
+_ASYNC_CONCURRENCY = 8
+
+# Lifetime (seconds) and size bounds for cached NLU responses, shared by
+# the process-wide cache and the per-session dedup in front of it
+_NLU_CACHE_TTL = 3600
+_NLU_CACHE_ENTRIES = 256
+
+# Seconds before a Watson HTTP request is abandoned
+_HTTP_TIMEOUT = 30
+
+# Watson NLU feature sets, keyed so cached responses never mix call sites
+_NLU_FEATURES = {
+    'entities+keywords+sentiment': lambda: Features(
+        entities=EntitiesOptions(sentiment=True, limit=10),
+        keywords=KeywordsOptions(sentiment=True, limit=10),
+        sentiment=SentimentOptions()
+    ),
+    # Batched cohort requests: Watson caps entity/keyword limits at 250
+    'entities+mentions+keywords+sentiment': lambda: Features(
+        entities=EntitiesOptions(sentiment=True, mentions=True, limit=250),
+        keywords=KeywordsOptions(sentiment=True, limit=250),
+        sentiment=SentimentOptions()
+    ),
+    'keywords+sentiment': lambda: Features(
+        keywords=KeywordsOptions(sentiment=True, limit=15),
+        sentiment=SentimentOptions()
+    ),
+}
+
+@st.cache_resource(show_spinner=False)
+def _shared_authenticator(api_key: str) -> IAMAuthenticator:
+    """
+    One IAM authenticator per API key, so its bearer token is reused until expiry
+    """
+    return IAMAuthenticator(api_key)
+
+def _orjson_response_hook(response: requests.Response, *args, **kwargs) -> requests.Response:
+    """
+    Have the SDK's response.json() decode JSON bodies with orjson
+    """
+    if 'json' in response.headers.get('Content-Type', ''):
+        response.json = lambda **_: orjson.loads(response.content)
+    return response
+
+@st.cache_resource(show_spinner=False)
+def _build_nlu(api_key: str, service_url: str) -> NaturalLanguageUnderstandingV1:
+    """
+    Build the Watson NLU client once and share it across reruns
+    """
+    nlu = NaturalLanguageUnderstandingV1(
+        version=_NLU_VERSION,
+        authenticator=_shared_authenticator(api_key)
+    )
+    nlu.set_service_url(service_url)
+    
+    # Keep-alive connection pool that lives as long as the cached client
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    if orjson is not None:
+        session.hooks['response'].append(_orjson_response_hook)
+    nlu.set_http_client(session)
+    nlu.set_http_config({'timeout': _HTTP_TIMEOUT})
+    return nlu
+
+# Health summary sent to Watson; lifestyle sentences are assembled separately
+_SUMMARY_TMPL = (
+    "Patient is a {age}-year-old {gender}. "
+    "with BMI of {bmi:.1f} ({bmi_cat}). "
+    "Blood pressure is {sbp}/{dbp} ({bp_cat}). "
+    "Fasting glucose level is {glucose} mg/dL. "
+    "Total cholesterol is {cholesterol} mg/dL with HDL of {hdl} mg/dL. "
+    "{lifestyle}"
+    "Risk assessment shows {diabetes_risk:.1f}% diabetes risk. "
+    "{heart_risk:.1f}% cardiovascular disease risk. "
+    "{hypertension_risk:.1f}% hypertension risk."
+)
+
+@dataclass(slots=True, frozen=True)
+class PatientCtx:
+    """
+    Patient fields and risk percentages resolved once per analysis. Fields hold
+    scalars for one patient or equal-length arrays for a cohort.
+    """
+    age: Any
+    gender: Any
+    bmi: Any
+    bmi_cat: Any
+    sbp: Any
+    dbp: Any
+    bp_cat: Any
+    glucose: Any
+    cholesterol: Any
+    hdl: Any
+    smoking: Any
+    exercise_days: Any
+    family_diabetes: Any
+    family_heart_disease: Any
+    family_hypertension: Any
+    diabetes_risk: Any
+    heart_risk: Any
+    hypertension_risk: Any
+    max_risk: Any
+
+# Category cut points for bisect (scalar) and np.digitize (cohort) lookups
+_BMI_CUTS = (18.5, 25, 30)
+_BMI_LABELS = ("underweight", "normal weight", "overweight", "obese")
+_BP_SYSTOLIC_CUTS = (120, 130, 140)
+_BP_DIASTOLIC_CUTS = (80, 90)
+_BP_LABELS = ("normal", "elevated", "stage 1 hypertension", "stage 2 hypertension")
+# Label index by (diastolic band, systolic band)
+_BP_GRID = (
+    (0, 1, 2, 2),
+    (2, 2, 2, 2),
+    (2, 2, 2, 3)
+)
+_BMI_LABEL_ARRAY = np.array(_BMI_LABELS, dtype=object)
+_BP_LABEL_ARRAY = np.array(_BP_LABELS, dtype=object)
+_BP_GRID_ARRAY = np.array(_BP_GRID)
+
+# Cohorts repeat the same readings, so memoize the scalar lookups
+@lru_cache(maxsize=4096)
+def _get_bmi_category(bmi: float) -> str:
+    """Get BMI category"""
+    return _BMI_LABELS[bisect_right(_BMI_CUTS, bmi)]
+
+@lru_cache(maxsize=4096)
+def _get_bp_category(systolic: int, diastolic: int) -> str:
+    """Get blood pressure category"""
+    grid_row = _BP_GRID[bisect_right(_BP_DIASTOLIC_CUTS, diastolic)]
+    return _BP_LABELS[grid_row[bisect_right(_BP_SYSTOLIC_CUTS, systolic)]]
+
+# Recommendation and advice rules as (predicate, message) pairs, in display order.
+# Predicates use & rather than `and` so they evaluate on scalars and cohort columns alike.
+_RECOMMENDATION_RULES = (
+    (lambda c: c.max_risk >= 70, "🚨 Immediate medical consultation recommended due to high risk profile"),
+    # BMI-based recommendations
+    (lambda c: c.bmi >= 30, "🎯 Weight management should be primary focus - consider structured program"),
+    # Lifestyle-based recommendations
+    (lambda c: c.smoking == 'Current', "🚭 Smoking cessation is critical - significant impact on all risk factors"),
+    (lambda c: c.exercise_days < 3, "🏃 Increase physical activity to minimum 150 minutes moderate exercise per week"),
+    # Lab-based recommendations
+    (lambda c: c.glucose >= 126, "🍎 Diabetes management protocol needed - dietary and medication evaluation"),
+    (lambda c: c.cholesterol >= 240, "💊 Cholesterol management essential - consider lipid-lowering therapy"),
+)
+
+_ADVICE_RULES = (
+    # Age-specific advice
+    (lambda c: c.age >= 65, "Focus on fall prevention, bone health, and regular health screenings"),
+    (lambda c: (c.age >= 50) & (c.age < 65), "Prioritize preventive screenings and cardiovascular health monitoring"),
+    (lambda c: (c.age >= 35) & (c.age < 50), "Establish healthy lifestyle patterns to prevent chronic disease development"),
+    # Gender-specific advice
+    (lambda c: (c.gender == 'Female') & (c.age >= 50), "Consider bone density screening and discuss hormone-related health changes"),
+    (lambda c: (c.gender == 'Male') & (c.age >= 40), "Regular cardiovascular monitoring is especially important"),
+    # Risk-specific advice
+    (lambda c: c.diabetes_risk >= 40, "Monitor blood glucose regularly and focus on carbohydrate management"),
+    (lambda c: c.heart_risk >= 40, "Heart-healthy diet with omega-3 fatty acids and regular cardio exercise"),
+    (lambda c: c.hypertension_risk >= 40, "Sodium reduction and stress management techniques are essential"),
+)
+
+def _apply_rules_vec(rules, ctx: PatientCtx) -> List[List[str]]:
+    """
+    Evaluate rules as boolean masks over a cohort context and collect messages per row
+    """
+    n = len(ctx.max_risk)
+    masks = np.column_stack([
+        np.broadcast_to(np.asarray(rule(ctx), dtype=bool), n)
+        for rule, _ in rules
+    ])
+    messages = [message for _, message in rules]
+    
+    results = [[] for _ in range(n)]
+    rows, cols = np.nonzero(masks)
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        results[row].append(messages[col])
+    return results
+
+# Static, immutable part of the no-Watson insights, shared across calls
+_FALLBACK_STATIC = {
+    'key_health_entities': (),
+    'priority_recommendations': (
+        "Complete Watson AI setup for enhanced insights",
+        "Regular health monitoring recommended",
+        "Lifestyle modifications based on risk factors"
+    ),
+    'risk_factors_identified': (),
+    'personalized_advice': ("Consult healthcare provider for personalized recommendations",),
+    'watson_used': False
+}
+
+# Entity types always surfaced regardless of relevance
+_KEY_ENTITY_TYPES = frozenset(('HealthCondition', 'Medicine', 'Anatomy'))
+
+# Separates patient summaries when several are analyzed in one request
+_PATIENT_DELIMITER = "\n---PATIENT_{}---\n"
+
+def _session_lookup(key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    This session's response for key, or None once it is missing or expired
+    """
+    seen = st.session_state.setdefault('nlu_seen', OrderedDict())
+    entry = seen.get(key)
+    if entry is None:
+        return None
+    stored_at, response = entry
+    if time.monotonic() - stored_at > _NLU_CACHE_TTL:
+        del seen[key]
+        return None
+    seen.move_to_end(key)
+    return response
+
+def _session_store(key: Tuple[str, str], response: Dict[str, Any]) -> None:
+    """
+    Remember a response for this session, evicting the least recently used beyond the cap
+    """
+    seen = st.session_state.setdefault('nlu_seen', OrderedDict())
+    seen[key] = (time.monotonic(), response)
+    seen.move_to_end(key)
+    while len(seen) > _NLU_CACHE_ENTRIES:
+        seen.popitem(last=False)
+
+def _text_digest(text: str) -> str:
+    """
+    Fixed-size cache key for an analysis text
+    """
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+@st.cache_data(ttl=_NLU_CACHE_TTL, max_entries=_NLU_CACHE_ENTRIES, show_spinner=False)
+def _cached_analyze(_nlu, _text: str, text_digest: str, feature_key: str) -> Dict[str, Any]:
+    """
+    Run Watson NLU once per distinct summary text and feature set
+    """
+    return _nlu.analyze(text=_text, features=_NLU_FEATURES[feature_key]()).get_result()
 
 class WatsonHealthcareAI:
     """
     IBM Watson AI integration for healthcare insights and analysis
     """
     
-    def __init__(self):
-        self.api_key = os.getenv('IBM_WATSON_API_KEY')
-        self.service_url = os.getenv('IBM_WATSON_URL')
-        self.service_instance_id = os.getenv('IBM_WATSON_SERVICE_INSTANCE_ID')
+    def __init__(self, low_risk_threshold: float = _LOW_RISK_THRESHOLD):
+        self.low_risk_threshold = low_risk_threshold
+        
+        self.api_key = _API_KEY
+        self.service_url = _SERVICE_URL
+        self.service_instance_id = _SERVICE_INSTANCE_ID
         
+        # Built once per process, so setup problems are recorded for the app to report
+        self.init_error = None
         if not all([self.api_key, self.service_url]):
-            st.warning("Watson AI credentials not fully configured. Some features may be limited.")
             self.watson_available = False
             return
         
         try:
-            # Initialize Watson Natural Language Understanding
-            self.authenticator = IAMAuthenticator(self.api_key)
-            self.nlu = NaturalLanguageUnderstandingV1(
-                version='2022-04-07',
-                authenticator=self.authenticator
-            )
-            self.nlu.set_service_url(self.service_url)
+            # Reuse the shared Watson Natural Language Understanding client
+            self.authenticator = _shared_authenticator(self.api_key)
+            self.nlu = _build_nlu(self.api_key, self.service_url)
             self.watson_available = True
             
         except Exception as e:
-            st.error(f"Failed to initialize Watson AI: {str(e)}")
+            self.init_error = str(e)
             self.watson_available = False
     
     def generate_health_insights(self, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
         """
         Generate AI-powered health insights using Watson
         """
+        ctx = self._patient_ctx(patient_data, risk_results)
+        
         if not self.watson_available:
-            return self._fallback_insights(patient_data, risk_results)
+            return self._fallback_insights(ctx)
+        
+        # Watson adds little signal for clearly low-risk profiles; use the local rules only
+        if self._is_low_risk(ctx):
+            return self._process_watson_analysis({}, ctx, watson_used=False)
         
         try:
             # Create a comprehensive health summary text
-            health_summary = self._create_health_summary(patient_data, risk_results)
+            health_summary = self._create_health_summary(ctx)
             
             # Analyze with Watson NLU
-            response = self.nlu.analyze(
-                text=health_summary,
-                features=Features(
-                    entities=EntitiesOptions(emotion=True, sentiment=True, limit=10),
-                    keywords=KeywordsOptions(emotion=True, sentiment=True, limit=10),
-                    sentiment=SentimentOptions()
-                )
-            ).get_result()
+            response = self._analyze(health_summary, 'entities+keywords+sentiment')
             
             # Process Watson insights
-            insights = self._process_watson_analysis(response, patient_data, risk_results)
+            insights = self._process_watson_analysis(response, ctx)
             return insights
             
         except Exception as e:
             st.warning(f"Watson analysis unavailable: {str(e)}")
-            return self._fallback_insights(patient_data, risk_results)
+            return self._fallback_insights(ctx)
     
-    def _create_health_summary(self, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> str:
+    def generate_health_insights_batch(self, patients: List[Dict[str, Any]], risks: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
         """
-        Create a comprehensive health summary for Watson analysis
+        Generate health insights for a cohort with a single Watson request.
+        The document sentiment covers the whole cohort, so these results
+        carry no per-patient sentiment.
         """
-        summary_parts = []
-        
-        # Patient demographics
-        summary_parts.append(f"Patient is a {patient_data['age']}-year-old {patient_data['gender'].lower()}")
-        
-        # Physical measurements
-        bmi_category = self._get_bmi_category(patient_data['bmi'])
-        summary_parts.append(f"with BMI of {patient_data['bmi']:.1f} ({bmi_category})")
+        ctxs = [self._patient_ctx(p, r) for p, r in zip(patients, risks)]
+        if not self.watson_available:
+            return [self._fallback_insights(ctx) for ctx in ctxs]
         
-        # Vital signs
-        bp_category = self._get_bp_category(patient_data['systolic_bp'], patient_data['diastolic_bp'])
-        summary_parts.append(f"Blood pressure is {patient_data['systolic_bp']}/{patient_data['diastolic_bp']} ({bp_category})")
+        try:
+            summaries = [self._create_health_summary(ctx) for ctx in ctxs]
+            
+            # Join summaries and record where each one starts in the combined text
+            parts = []
+            starts = []
+            offset = 0
+            for i, summary in enumerate(summaries):
+                if i:
+                    delimiter = _PATIENT_DELIMITER.format(i)
+                    parts.append(delimiter)
+                    offset += len(delimiter)
+                starts.append(offset)
+                parts.append(summary)
+                offset += len(summary)
+            
+            response = self._analyze(''.join(parts), 'entities+mentions+keywords+sentiment')
+            
+            # Assign entities to patients by mention offsets
+            entity_buckets = [[] for _ in summaries]
+            for entity in response.get('entities', []):
+                owners = {
+                    bisect_right(starts, m['location'][0]) - 1
+                    for m in entity.get('mentions', []) if m.get('location')
+                }
+                for i in sorted(owners):
+                    entity_buckets[i].append(entity)
+            
+            # Keywords carry no offsets, so match them against each summary's text;
+            # template phrases found in several summaries cannot be attributed and are dropped
+            lowered = [summary.lower() for summary in summaries]
+            keyword_buckets = [[] for _ in summaries]
+            for keyword in response.get('keywords', []):
+                text = keyword.get('text', '').lower()
+                owners = [i for i, summary in enumerate(lowered) if text and text in summary]
+                if len(owners) == 1:
+                    keyword_buckets[owners[0]].append(keyword)
+            
+            return [
+                self._process_watson_analysis({'entities': entity_buckets[i], 'keywords': keyword_buckets[i]}, ctx)
+                for i, ctx in enumerate(ctxs)
+            ]
+            
+        except Exception as e:
+            st.warning(f"Watson analysis unavailable: {str(e)}")
+            return [self._fallback_insights(ctx) for ctx in ctxs]
+    
+    def generate_health_insights_concurrent(self, patients: List[Dict[str, Any]], risks: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Synchronous entry point for the async cohort path, usable from Streamlit
+        """
+        return asyncio.run(self.generate_health_insights_batch_async(patients, risks))
+    
+    async def generate_health_insights_batch_async(self, patients: List[Dict[str, Any]], risks: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Generate health insights for a cohort with concurrent Watson requests
+        """
+        if not self.watson_available or httpx is None:
+            return [self.generate_health_insights(p, r) for p, r in zip(patients, risks)]
         
-        # Laboratory values
-        summary_parts.append(f"Fasting glucose level is {patient_data['glucose']} mg/dL")
-        summary_parts.append(f"Total cholesterol is {patient_data['cholesterol']} mg/dL with HDL of {patient_data['hdl']} mg/dL")
+        ctxs = [self._patient_ctx(p, r) for p, r in zip(patients, risks)]
+        summaries = [self._create_health_summary(ctx) for ctx in ctxs]
+        features_json = _NLU_FEATURES['entities+keywords+sentiment']().to_dict()
         
-        # Lifestyle factors
-        if patient_data['smoking'] != 'Never':
-            summary_parts.append(f"Patient is a {patient_data['smoking'].lower()} smoker")
+        try:
+            token = self.authenticator.token_manager.get_token()
+        except Exception as e:
+            st.warning(f"Watson analysis unavailable: {str(e)}")
+            return [self._fallback_insights(ctx) for ctx in ctxs]
         
-        if patient_data['exercise_days'] < 3:
-            summary_parts.append("Patient has limited physical activity")
-        else:
-            summary_parts.append(f"Patient exercises {patient_data['exercise_days']} days per week")
+        semaphore = asyncio.Semaphore(_ASYNC_CONCURRENCY)
+        async with httpx.AsyncClient(timeout=_HTTP_TIMEOUT) as client:
+            responses = await asyncio.gather(
+                *[self._analyze_async(client, semaphore, token, summary, features_json) for summary in summaries],
+                return_exceptions=True
+            )
         
-        # Family history
-        family_conditions = []
-        if patient_data['family_diabetes']:
-            family_conditions.append("diabetes")
-        if patient_data['family_heart_disease']:
-            family_conditions.append("heart disease")
-        if patient_data['family_hypertension']:
-            family_conditions.append("hypertension")
-        
-        if family_conditions:
-            summary_parts.append(f"Family history includes {', '.join(family_conditions)}")
-        
-        # Risk assessment results
+        return [
+            self._fallback_insights(ctx) if isinstance(response, Exception)
+            else self._process_watson_analysis(response, ctx)
+            for response, ctx in zip(responses, ctxs)
+        ]
+    
+    async def _analyze_async(self, client, semaphore: asyncio.Semaphore, token: str, text: str, features_json: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST one analyze request to the Watson NLU REST endpoint
+        """
+        async with semaphore:
+            response = await client.post(
+                f"{self.service_url.rstrip('/')}/v1/analyze",
+                params={'version': _NLU_VERSION},
+                headers={'Authorization': f"Bearer {token}"},
+                json={'text': text, 'features': features_json}
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content) if orjson is not None else response.json()
+    
+    def _analyze(self, text: str, feature_key: str) -> Dict[str, Any]:
+        """
+        Analyze text with Watson NLU, reusing responses for repeated summaries
+        """
+        text_digest = _text_digest(text)
+        
+        # Identical summaries within a session reuse the first response
+        key = (feature_key, text_digest)
+        response = _session_lookup(key)
+        if response is None:
+            response = _cached_analyze(self.nlu, text, text_digest, feature_key)
+            _session_store(key, response)
+        return response
+    
+    def _is_low_risk(self, ctx: PatientCtx) -> bool:
+        """
+        Whether a profile is clearly low-risk enough to skip Watson
+        """
+        return ctx.max_risk < self.low_risk_threshold and ctx.bmi < 30 and ctx.smoking == 'Never'
+    
+    def _patient_ctx(self, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> PatientCtx:
+        """
+        Resolve the patient fields and risks every insight helper reads
+        """
         diabetes_risk = risk_results['diabetes']['risk_percentage']
         heart_risk = risk_results['heart_disease']['risk_percentage']
         hypertension_risk = risk_results['hypertension']['risk_percentage']
         
-        summary_parts.append(f"Risk assessment shows {diabetes_risk:.1f}% diabetes risk")
-        summary_parts.append(f"{heart_risk:.1f}% cardiovascular disease risk")
-        summary_parts.append(f"{hypertension_risk:.1f}% hypertension risk")
+        return PatientCtx(
+            age=patient_data['age'],
+            gender=patient_data['gender'],
+            bmi=patient_data['bmi'],
+            bmi_cat=_get_bmi_category(patient_data['bmi']),
+            sbp=patient_data['systolic_bp'],
+            dbp=patient_data['diastolic_bp'],
+            bp_cat=_get_bp_category(patient_data['systolic_bp'], patient_data['diastolic_bp']),
+            glucose=patient_data['glucose'],
+            cholesterol=patient_data['cholesterol'],
+            hdl=patient_data['hdl'],
+            smoking=patient_data['smoking'],
+            exercise_days=patient_data['exercise_days'],
+            family_diabetes=patient_data['family_diabetes'],
+            family_heart_disease=patient_data['family_heart_disease'],
+            family_hypertension=patient_data['family_hypertension'],
+            diabetes_risk=diabetes_risk,
+            heart_risk=heart_risk,
+            hypertension_risk=hypertension_risk,
+            max_risk=max(diabetes_risk, heart_risk, hypertension_risk)
+        )
+    
+    def _create_health_summary(self, ctx: PatientCtx) -> str:
+        """
+        Create a comprehensive health summary for Watson analysis
+        """
+        # Family history
+        family_conditions = [
+            condition for condition, present in (
+                ("diabetes", ctx.family_diabetes),
+                ("heart disease", ctx.family_heart_disease),
+                ("hypertension", ctx.family_hypertension)
+            ) if present
+        ]
+        
+        # Lifestyle factors, followed by family history
+        lifestyle = (
+            (f"Patient is a {ctx.smoking.lower()} smoker. " if ctx.smoking != 'Never' else "")
+            + ("Patient has limited physical activity. " if ctx.exercise_days < 3
+               else f"Patient exercises {ctx.exercise_days} days per week. ")
+            + (f"Family history includes {', '.join(family_conditions)}. " if family_conditions else "")
+        )
         
-        return ". ".join(summary_parts) + "."
+        return _SUMMARY_TMPL.format(
+            age=ctx.age,
+            gender=ctx.gender.lower(),
+            bmi=ctx.bmi,
+            bmi_cat=ctx.bmi_cat,
+            sbp=ctx.sbp,
+            dbp=ctx.dbp,
+            bp_cat=ctx.bp_cat,
+            glucose=ctx.glucose,
+            cholesterol=ctx.cholesterol,
+            hdl=ctx.hdl,
+            lifestyle=lifestyle,
+            diabetes_risk=ctx.diabetes_risk,
+            heart_risk=ctx.heart_risk,
+            hypertension_risk=ctx.hypertension_risk
+        )
     
-    def _process_watson_analysis(self, watson_response: Dict, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    def _process_watson_analysis(self, watson_response: Dict, ctx: PatientCtx, watson_used: bool = True) -> Dict[str, Any]:
         """
-        Process Watson NLU analysis results into actionable insights
+        Process Watson NLU analysis results into actionable insights; watson_used=False
+        marks insights built from the local rules alone
         """
         insights = {
             'ai_summary': '',
+            'watson_used': watson_used,
             'key_health_entities': [],
             'priority_recommendations': [],
             'sentiment_analysis': {},
@@ -132,25 +540,30 @@ class WatsonHealthcareAI:
         }
         
         # Extract key health entities
-        if 'entities' in watson_response:
-            for entity in watson_response['entities']:
-                if entity.get('type') in ['HealthCondition', 'Medicine', 'Anatomy'] or entity.get('relevance', 0) > 0.7:
-                    insights['key_health_entities'].append({
-                        'entity': entity.get('text', ''),
-                        'type': entity.get('type', ''),
-                        'relevance': entity.get('relevance', 0),
-                        'sentiment': entity.get('sentiment', {}).get('label', 'neutral')
-                    })
+        key_entities_append = insights['key_health_entities'].append
+        for entity in watson_response.get('entities', ()):
+            entity_type = entity.get('type', '')
+            relevance = entity.get('relevance', 0)
+            if entity_type in _KEY_ENTITY_TYPES or relevance > 0.7:
+                sentiment = entity.get('sentiment')
+                key_entities_append({
+                    'entity': entity.get('text', ''),
+                    'type': entity_type,
+                    'relevance': relevance,
+                    'sentiment': sentiment.get('label', 'neutral') if sentiment else 'neutral'
+                })
         
         # Process keywords for risk factors
-        if 'keywords' in watson_response:
-            for keyword in watson_response['keywords']:
-                if keyword.get('relevance', 0) > 0.5:
-                    insights['risk_factors_identified'].append({
-                        'factor': keyword.get('text', ''),
-                        'relevance': keyword.get('relevance', 0),
-                        'sentiment': keyword.get('sentiment', {}).get('label', 'neutral')
-                    })
+        risk_factors_append = insights['risk_factors_identified'].append
+        for keyword in watson_response.get('keywords', ()):
+            relevance = keyword.get('relevance', 0)
+            if relevance > 0.5:
+                sentiment = keyword.get('sentiment')
+                risk_factors_append({
+                    'factor': keyword.get('text', ''),
+                    'relevance': relevance,
+                    'sentiment': sentiment.get('label', 'neutral') if sentiment else 'neutral'
+                })
         
         # Overall sentiment analysis
         if 'sentiment' in watson_response:
@@ -161,104 +574,83 @@ class WatsonHealthcareAI:
         
         # Generate AI-powered recommendations
         insights['priority_recommendations'] = self._generate_ai_recommendations(
-            watson_response, patient_data, risk_results
+            watson_response, ctx
         )
         
         # Create personalized advice
         insights['personalized_advice'] = self._generate_personalized_advice(
-            watson_response, patient_data, risk_results
+            watson_response, ctx
         )
         
         # Generate AI summary
-        insights['ai_summary'] = self._generate_ai_summary(insights, patient_data, risk_results)
+        insights['ai_summary'] = self._generate_ai_summary(insights, ctx)
         
         return insights
     
-    def _generate_ai_recommendations(self, watson_response: Dict, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> List[str]:
+    def _generate_ai_recommendations(self, watson_response: Dict, ctx: PatientCtx) -> List[str]:
         """
         Generate AI-powered priority recommendations
         """
-        recommendations = []
-        
-        # Analyze highest risk areas
-        max_risk = max([
-            risk_results['diabetes']['risk_percentage'],
-            risk_results['heart_disease']['risk_percentage'],
-            risk_results['hypertension']['risk_percentage']
-        ])
-        
-        if max_risk >= 70:
-            recommendations.append("🚨 Immediate medical consultation recommended due to high risk profile")
-        
-        # BMI-based recommendations
-        if patient_data['bmi'] >= 30:
-            recommendations.append("🎯 Weight management should be primary focus - consider structured program")
-        
-        # Lifestyle-based recommendations
-        if patient_data['smoking'] == 'Current':
-            recommendations.append("🚭 Smoking cessation is critical - significant impact on all risk factors")
-        
-        if patient_data['exercise_days'] < 3:
-            recommendations.append("🏃 Increase physical activity to minimum 150 minutes moderate exercise per week")
-        
-        # Lab-based recommendations
-        if patient_data['glucose'] >= 126:
-            recommendations.append("🍎 Diabetes management protocol needed - dietary and medication evaluation")
-        
-        if patient_data['cholesterol'] >= 240:
-            recommendations.append("💊 Cholesterol management essential - consider lipid-lowering therapy")
-        
+        recommendations = [message for rule, message in _RECOMMENDATION_RULES if rule(ctx)]
         return recommendations[:5]  # Limit to top 5 recommendations
     
-    def _generate_personalized_advice(self, watson_response: Dict, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> List[str]:
+    def _generate_personalized_advice(self, watson_response: Dict, ctx: PatientCtx) -> List[str]:
         """
         Generate personalized health advice based on AI analysis
         """
-        advice = []
-        
-        # Age-specific advice
-        age = patient_data['age']
-        if age >= 65:
-            advice.append("Focus on fall prevention, bone health, and regular health screenings")
-        elif age >= 50:
-            advice.append("Prioritize preventive screenings and cardiovascular health monitoring")
-        elif age >= 35:
-            advice.append("Establish healthy lifestyle patterns to prevent chronic disease development")
-        
-        # Gender-specific advice
-        if patient_data['gender'] == 'Female' and age >= 50:
-            advice.append("Consider bone density screening and discuss hormone-related health changes")
-        elif patient_data['gender'] == 'Male' and age >= 40:
-            advice.append("Regular cardiovascular monitoring is especially important")
-        
-        # Risk-specific advice
-        diabetes_risk = risk_results['diabetes']['risk_percentage']
-        if diabetes_risk >= 40:
-            advice.append("Monitor blood glucose regularly and focus on carbohydrate management")
-        
-        heart_risk = risk_results['heart_disease']['risk_percentage']
-        if heart_risk >= 40:
-            advice.append("Heart-healthy diet with omega-3 fatty acids and regular cardio exercise")
+        return [message for rule, message in _ADVICE_RULES if rule(ctx)]
+    
+    def generate_cohort_recommendations(self, patients, risks) -> Dict[str, List[List[str]]]:
+        """
+        Evaluate the recommendation and advice rules for a whole cohort at once.
         
-        hypertension_risk = risk_results['hypertension']['risk_percentage']
-        if hypertension_risk >= 40:
-            advice.append("Sodium reduction and stress management techniques are essential")
+        `patients` holds the patient columns and `risks` the `<condition>_risk`
+        columns from RiskCalculator.calculate_all_risks_batch.
+        """
+        bmi = np.asarray(patients['bmi'])
+        sbp = np.asarray(patients['systolic_bp'])
+        dbp = np.asarray(patients['diastolic_bp'])
+        diabetes_risk = np.asarray(risks['diabetes_risk'], dtype=np.float64)
+        heart_risk = np.asarray(risks['heart_disease_risk'], dtype=np.float64)
+        hypertension_risk = np.asarray(risks['hypertension_risk'], dtype=np.float64)
+        
+        ctx = PatientCtx(
+            age=np.asarray(patients['age']),
+            gender=np.asarray(patients['gender']),
+            bmi=bmi,
+            bmi_cat=self._bmi_category_vec(bmi),
+            sbp=sbp,
+            dbp=dbp,
+            bp_cat=self._bp_category_vec(sbp, dbp),
+            glucose=np.asarray(patients['glucose']),
+            cholesterol=np.asarray(patients['cholesterol']),
+            hdl=np.asarray(patients['hdl']),
+            smoking=np.asarray(patients['smoking']),
+            exercise_days=np.asarray(patients['exercise_days']),
+            family_diabetes=np.asarray(patients['family_diabetes']),
+            family_heart_disease=np.asarray(patients['family_heart_disease']),
+            family_hypertension=np.asarray(patients['family_hypertension']),
+            diabetes_risk=diabetes_risk,
+            heart_risk=heart_risk,
+            hypertension_risk=hypertension_risk,
+            max_risk=np.maximum.reduce([diabetes_risk, heart_risk, hypertension_risk])
+        )
         
-        return advice
+        recommendations = _apply_rules_vec(_RECOMMENDATION_RULES, ctx)
+        return {
+            'priority_recommendations': [row[:5] for row in recommendations],
+            'personalized_advice': _apply_rules_vec(_ADVICE_RULES, ctx)
+        }
     
-    def _generate_ai_summary(self, insights: Dict, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> str:
+    def _generate_ai_summary(self, insights: Dict, ctx: PatientCtx) -> str:
         """
         Generate comprehensive AI summary
         """
-        max_risk = max([
-            risk_results['diabetes']['risk_percentage'],
-            risk_results['heart_disease']['risk_percentage'],
-            risk_results['hypertension']['risk_percentage']
-        ])
-        
+        max_risk = ctx.max_risk
         risk_level = "high" if max_risk >= 70 else "moderate" if max_risk >= 40 else "low"
         
-        summary = f"AI Analysis: This {patient_data['age']}-year-old {patient_data['gender'].lower()} presents with {risk_level} overall health risk. "
+        prefix = "AI Analysis" if insights['watson_used'] else "Rule-based Analysis"
+        summary = f"{prefix}: This {ctx.age}-year-old {ctx.gender.lower()} presents with {risk_level} overall health risk. "
         
         if insights['sentiment_analysis'].get('overall_sentiment') == 'negative':
             summary += "Multiple concerning risk factors identified requiring immediate attention. "
@@ -273,50 +665,27 @@ class WatsonHealthcareAI:
         
         return summary
     
-    def _fallback_insights(self, patient_data: Dict[str, Any], risk_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    def _fallback_insights(self, ctx: PatientCtx) -> Dict[str, Any]:
         """
         Provide basic insights when Watson is unavailable
         """
-        max_risk = max([
-            risk_results['diabetes']['risk_percentage'],
-            risk_results['heart_disease']['risk_percentage'],
-            risk_results['hypertension']['risk_percentage']
-        ])
-        
         return {
-            'ai_summary': f"Standard analysis shows {max_risk:.1f}% maximum risk. AI-enhanced insights require Watson configuration.",
-            'key_health_entities': [],
-            'priority_recommendations': [
-                "Complete Watson AI setup for enhanced insights",
-                "Regular health monitoring recommended",
-                "Lifestyle modifications based on risk factors"
-            ],
-            'sentiment_analysis': {'overall_sentiment': 'neutral', 'confidence': 0.5},
-            'risk_factors_identified': [],
-            'personalized_advice': ["Consult healthcare provider for personalized recommendations"]
+            'ai_summary': f"Standard analysis shows {ctx.max_risk:.1f}% maximum risk. AI-enhanced insights require Watson configuration.",
+            **_FALLBACK_STATIC,
+            # Mutable, so built per call rather than shared
+            'sentiment_analysis': {'overall_sentiment': 'neutral', 'confidence': 0.5}
         }
     
-    def _get_bmi_category(self, bmi: float) -> str:
-        """Get BMI category"""
-        if bmi < 18.5:
-            return "underweight"
-        elif bmi < 25:
-            return "normal weight"
-        elif bmi < 30:
-            return "overweight"
-        else:
-            return "obese"
+    @classmethod
+    def _bmi_category_vec(cls, bmis: np.ndarray) -> np.ndarray:
+        """Get BMI categories for an array of BMI values"""
+        return _BMI_LABEL_ARRAY[np.digitize(bmis, _BMI_CUTS)]
     
-    def _get_bp_category(self, systolic: int, diastolic: int) -> str:
-        """Get blood pressure category"""
-        if systolic < 120 and diastolic < 80:
-            return "normal"
-        elif systolic < 130 and diastolic < 80:
-            return "elevated"
-        elif systolic < 140 or diastolic < 90:
-            return "stage 1 hypertension"
-        else:
-            return "stage 2 hypertension"
+    @classmethod
+    def _bp_category_vec(cls, systolic: np.ndarray, diastolic: np.ndarray) -> np.ndarray:
+        """Get blood pressure categories for arrays of readings"""
+        grid_index = _BP_GRID_ARRAY[np.digitize(diastolic, _BP_DIASTOLIC_CUTS), np.digitize(systolic, _BP_SYSTOLIC_CUTS)]
+        return _BP_LABEL_ARRAY[grid_index]
 
     def analyze_population_trends(self, population_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -334,13 +703,7 @@ class WatsonHealthcareAI:
             pop_summary = self._create_population_summary(population_data)
             
             # Analyze with Watson
-            response = self.nlu.analyze(
-                text=pop_summary,
-                features=Features(
-                    keywords=KeywordsOptions(sentiment=True, limit=15),
-                    sentiment=SentimentOptions()
-                )
-            ).get_result()
+            response = self._analyze(pop_summary, 'keywords+sentiment')
             
             return self._process_population_analysis(response, population_data)
             
@@ -377,3 +740,11 @@ class WatsonHealthcareAI:
                 if keyword.get('relevance', 0) > 0.6
             ]
         }
+
+@st.cache_resource(show_spinner=False)
+def get_watson_ai(low_risk_threshold: float = _LOW_RISK_THRESHOLD) -> WatsonHealthcareAI:
+    """
+    Shared WatsonHealthcareAI for the server process; import this rather than
+    constructing the class so Streamlit reruns skip re-initialization
+    """
+    return WatsonHealthcareAI(low_risk_threshold=low_risk_threshold)